@@ -3,69 +3,108 @@
 
 # https://blog.darrenjrobinson.com/accessing-the-windows-certificate-store-using-python/
 
-import base64
+import hashlib
+import io
 import os
-import ssl
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
 
-import slugify as unicode_slug
 import wincertstore
 from cryptography import x509
 from cryptography.hazmat.backends import default_backend
-from cryptography.hazmat.primitives import hashes
 
 # from cryptography.x509.oid import ExtensionOID
 
-
-def hex_string_readable(bytes):
-    return ["{:02X}".format(x) for x in bytes]
+_BACKEND = default_backend()
+_SLUG_RE = re.compile(r"[^A-Za-z0-9]+")
 
 
 def slugify(text, separator="_"):
     """Slugify a given text."""
     if text == "" or text is None:
         return ""
-    slug = unicode_slug.slugify(text, separator=separator)
-    return "unknown" if slug == "" else slug
-
-
-if os.name == "nt":
-    cnt = 0
-    for storename in ("ROOT", "CA", "MY"):
-        with wincertstore.CertSystemStore(storename) as store:
-            for cert in store.itercerts(usage=wincertstore.SERVER_AUTH):
-
-                pem = cert.get_pem()
-                encoded_der = "".join(pem.split("\n")[1:-2])
-
-                cert_bytes = base64.b64decode(encoded_der)
-                cert_pem = ssl.DER_cert_to_PEM_cert(cert_bytes)
-                cert_details = x509.load_pem_x509_certificate(cert_pem.encode("utf-8"), default_backend())
+    if text.isascii():
+        # fast path: nothing to transliterate, no need for python-slugify (and its unidecode import)
+        slug = _SLUG_RE.sub(separator, text).strip(separator).lower()
+    else:
+        import slugify as unicode_slug
 
-                fingerprint = hex_string_readable(cert_details.fingerprint(hashes.SHA1()))
-                fingerprint_string = "".join(fingerprint)
-
-                print(cert.get_name())
-                print("     Issuer: ", cert_details.issuer.rfc4514_string())
-                print("     Thumbprint: ", fingerprint_string.lower())
-                print("     Subject: ", cert_details.subject.rfc4514_string())
-                print("     Serial Number: ", hex(cert_details.serial_number).replace("0x", ""))
-                print("     Issued (UTC): ", cert_details.not_valid_before)
-                print("     Expiry (UTC): ", cert_details.not_valid_after)
-
-                # san = cert_details.extensions.get_extension_for_class(x509.SubjectAlternativeName).value
-                # names = san.get_values_for_type(x509.DNSName)
-                # print("     SAN(s): ", names)
-
-                # cert_usages = cert_details.extensions.get_extension_for_oid(ExtensionOID.EXTENDED_KEY_USAGE).value._usages
-                # print("     Usage(s): ", cert_usages)
-
-                # write .cer file
-                with open(f"{slugify(cert.get_name())}.cer", "wb") as f:
-                    f.write(cert_bytes)
+        slug = unicode_slug.slugify(text, separator=separator)
+    return "unknown" if slug == "" else slug
 
-                print()
-                cnt += 1
 
-    print(f"Successfully exported {cnt} certificates.")
-else:
-    print("This only works on a Windows System.")
+def export_cert(filename, cert_bytes, write=True):
+    """Parse a DER encoded certificate, write it to a .cer file (if requested) and return the details."""
+    cert_details = x509.load_der_x509_certificate(cert_bytes, _BACKEND)
+
+    # write .cer file (single write of the whole DER blob, no buffer needed)
+    if write:
+        with open(filename, "wb", buffering=0) as f:
+            f.write(cert_bytes)
+
+    return cert_details
+
+
+def main():
+    """Export the certificates of the Windows system stores to .cer files."""
+    if os.name == "nt":
+        # collect the certificates first; parsing and writing is done concurrently
+        # the same certificate may be contained in several stores, it is exported only once
+        names, blobs, fingerprints = [], [], []
+        seen = set()
+        for storename in ("ROOT", "CA", "MY"):
+            with wincertstore.CertSystemStore(storename) as store:
+                for cert in store.itercerts(usage=wincertstore.SERVER_AUTH):
+                    # raw DER bytes (pbCertEncoded of the CryptoAPI CERT_CONTEXT), no PEM encoding involved
+                    cert_bytes = cert.get_encoded()
+                    fingerprint_string = hashlib.sha1(cert_bytes).hexdigest()
+                    if fingerprint_string in seen:
+                        continue
+                    seen.add(fingerprint_string)
+                    names.append(cert.get_name())
+                    blobs.append(cert_bytes)
+                    fingerprints.append(fingerprint_string)
+
+        # different certificates may have the same name (e.g. reissued intermediates): write only
+        # the last one of them to the file (as done sequentially), so no file is written twice at once
+        filenames = [f"{slugify(name)}.cer" for name in names]
+        last = {filename: i for i, filename in enumerate(filenames)}
+        writes = [last[filename] == i for i, filename in enumerate(filenames)]
+
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+            results = list(executor.map(export_cert, filenames, blobs, writes))
+
+        # print the details in the original order of the certificates
+        # (collected in memory and written to stdout at once instead of line by line)
+        out = io.StringIO()
+        for name, fingerprint_string, cert_details in zip(names, fingerprints, results):
+            issuer = cert_details.issuer.rfc4514_string()
+            subject = cert_details.subject.rfc4514_string()
+            out.write(
+                f"{name}\n"
+                f"     Issuer:  {issuer}\n"
+                f"     Thumbprint:  {fingerprint_string}\n"
+                f"     Subject:  {subject}\n"
+                f"     Serial Number:  {cert_details.serial_number:x}\n"
+                f"     Issued (UTC):  {cert_details.not_valid_before}\n"
+                f"     Expiry (UTC):  {cert_details.not_valid_after}\n"
+            )
+
+            # san = cert_details.extensions.get_extension_for_class(x509.SubjectAlternativeName).value
+            # names = san.get_values_for_type(x509.DNSName)
+            # out.write(f"     SAN(s):  {names}\n")
+
+            # cert_usages = cert_details.extensions.get_extension_for_oid(ExtensionOID.EXTENDED_KEY_USAGE).value._usages
+            # out.write(f"     Usage(s):  {cert_usages}\n")
+
+            out.write("\n")
+
+        print(f"Successfully exported {len(results)} certificates.", file=out)
+        sys.stdout.write(out.getvalue())
+    else:
+        print("This only works on a Windows System.")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,20 +2,22 @@
 # -*- coding: utf-8 -*-
 
 # general imports
+import asyncio
 import datetime
+import struct
 import sys
 
 # imports for Modbus
-from pymodbus.constants import Endian
-from pymodbus.payload import BinaryPayloadDecoder
-from pymodbus.client import ModbusTcpClient as ModbusClient
+from pymodbus.client import AsyncModbusTcpClient as ModbusClient
+from pymodbus.exceptions import ConnectionException, ModbusIOException
+from pymodbus.register_read_message import ReadHoldingRegistersRequest
 
 # imports for using enumerations
-from enum import Enum
+from enum import IntEnum
 
-# enumeration by using a class. value of the enum ( 1-8 ) is irrelevant!
+# enumeration by using a class. value of the enum ( 1-9 ) is irrelevant, but must be unique!
 # use the method getRegisterLength() instead
-class DataType(Enum):
+class DataType(IntEnum):
     String8 = 1
     String16 = 2
     String32 = 3
@@ -24,143 +26,199 @@ class DataType(Enum):
     Int32 = 6
     UInt32 = 7
     Float32 = 8
-    UInt64 = 7
+    UInt64 = 9
 
     # Returns the length (amount) of the registers.
     # This corresponds to the value from the Fronius Excel list (column "Size").
     # This refers to how many registers the Mobus function read_holding_registers() must read to get the complete value
     def getRegisterLength(self):
-
-        if (self == DataType.String8) or (self == DataType.UInt64):
-            return int(4)
-        elif (self == DataType.String16):
-            return int(8)
-        elif (self == DataType.String32):
-            return int(16)
-        elif (self == DataType.Int16) or (self == DataType.UInt16):
-            return int(1)
-        elif (self == DataType.Int32) or (self == DataType.UInt32) or (self == DataType.Float32):
-            return int(2)
-
-
-# -------------------------------------------------------------------------------------------------------[ private ]---
-# | Gets a value from the inverter                                                                                    |
+        return _REGISTER_LENGTH[self]
+
+
+# Length (amount) of the registers per DataType
+_REGISTER_LENGTH = {
+    DataType.String8: 4,
+    DataType.String16: 8,
+    DataType.String32: 16,
+    DataType.Int16: 1,
+    DataType.UInt16: 1,
+    DataType.Int32: 2,
+    DataType.UInt32: 2,
+    DataType.Float32: 2,
+    DataType.UInt64: 4,
+}
+
+
+# Returns a function decoding a (NUL padded) string of the given size from a big-endian register buffer
+def _stringDecoder(size):
+    def decode(buf, offset):
+        return buf[offset:offset+size].rstrip(b"\x00").decode('utf-8')
+    return decode
+
+
+# Returns a function decoding a number with the given struct format from a big-endian register buffer
+def _numberDecoder(fmt):
+    unpack_from = struct.Struct(fmt).unpack_from
+    def decode(buf, offset):
+        return unpack_from(buf, offset)[0]
+    return decode
+
+
+# Decoder function per DataType, which reformats the values read from Modbus.
+# All Fronius registers are big-endian (byte and word order), so the values are taken directly out of the
+# bytes of the registers with the C implementation of struct.
+_DECODERS = {
+    DataType.String8: _stringDecoder(8),
+    DataType.String16: _stringDecoder(16),
+    DataType.String32: _stringDecoder(32),
+    DataType.Int16: _numberDecoder(">h"),
+    DataType.UInt16: _numberDecoder(">H"),
+    DataType.Int32: _numberDecoder(">i"),
+    DataType.UInt32: _numberDecoder(">I"),
+    DataType.Float32: _numberDecoder(">f"),
+    DataType.UInt64: _numberDecoder(">Q"),
+}
+
+
+# Maximum amount of registers of a single read_holding_registers() request
+_MAX_REGISTERS = 125
+
+
+# ---------------------------------------------------------------------------------------------------------[ class ]---
+# | Reads values from the inverter or smartmeter                                                                      |
 # | ----------------------------------------------------------------------------------------------------------------- |
-# | Input parameters:                                                                                                 |
-# | -> device           ModbusClient  An open connection to the modbus device (inverter or smartmeter)                |
-# | -> address          INT           The starting address to read from                                               |
-# | -> dataType         DataType      The DataType of registers to read                                               |
-# | -> humidity         INT           The slave unit this request is targeting                                        |
+# | Keeps the open connection together with the decoder table and a buffer for the bytes of the registers, so nothing |
+# | has to be looked up or created again for every value that is read.                                                |
 # | ----------------------------------------------------------------------------------------------------------------- |
-# | Return value:                                                                                                     |
-# | <- result           STRING        Value of the defined address                                                    |
+# | Input parameters:                                                                                                 |
+# | -> client           ModbusClient  An open connection to the modbus device (inverter or smartmeter)                |
 # ---------------------------------------------------------------------------------------------------------------------
-def getRegisterValue(device, address, dataType, unitNo):
-
-    #print ("  Adr: " + str(address) + "  Name: " + dataType.name)
-
-    # Now we can read the data of the register with a Modbus function
-    # In the fronius documentation it is described that you have to subtract 1 from the actual address.
-    result = device.read_holding_registers(address-1, dataType.getRegisterLength(), unitNo)
-
-    if (result.isError()) :
-        return "n.a."
-
-    #print ("  value: " + str(result.registers))
-
-    # The values from Modbus must now be reformatted accordingly
-    # How to do this reformatting depends on the DataType
-    decoder = BinaryPayloadDecoder.fromRegisters(result.registers, byteorder=Endian.Big, wordorder=Endian.Big)
-
-    if (dataType == DataType.String8) or (dataType == DataType.String16) or (dataType == DataType.String32):
-        return str(decoder.decode_string(16).decode('utf-8'))
-
-    elif (dataType == DataType.Int16):
-        return decoder.decode_16bit_int()
-
-    elif (dataType == DataType.UInt16):
-        return decoder.decode_16bit_uint()
-
-    elif (dataType == DataType.Int32):
-        return decoder.decode_32bit_int()
-
-    elif (dataType == DataType.UInt32):
-        return decoder.decode_32bit_uint()
-
-    elif (dataType == DataType.Float32):
-        return decoder.decode_32bit_float()
-
-    else:
-        return str(decoder.decode_bits())
+class FroniusReader:
+
+    def __init__(self, client):
+        self._client = client
+        self._decoders = _DECODERS
+        self._buffer = bytearray(2 * _MAX_REGISTERS)
+
+    # Gets a value from the device
+    #  -> address   INT       The starting address to read from
+    #  -> dataType  DataType  The DataType of registers to read
+    #  -> unitNo    INT       The slave unit this request is targeting
+    #  <- result    STRING    Value of the defined address
+    async def read(self, address, dataType, unitNo):
+        return (await self.readValues(((address, dataType),), unitNo))[0]
+
+    # Gets several values of one device with a single Modbus request
+    #  -> registers  LIST  (address, DataType) tuples of the values to read
+    #  -> unitNo     INT   The slave unit this request is targeting
+    #  <- result     LIST  Values of the defined addresses (in the order of registers)
+    async def readValues(self, registers, unitNo):
+
+        # All registers are covered by one contiguous block, which is read with a single round-trip.
+        # A block must not exceed _MAX_REGISTERS (Modbus limit of read_holding_registers()).
+        start = min(address for address, _ in registers)
+        end = max(address + dataType.getRegisterLength() for address, dataType in registers)
+        count = end - start
+        if count > _MAX_REGISTERS:
+            raise ValueError(f"Block of {count} registers (starting at {start}) exceeds the limit of {_MAX_REGISTERS} registers")
+
+        # Now we can read the data of the registers with a Modbus function
+        # In the fronius documentation it is described that you have to subtract 1 from the actual address.
+        response = await self._client.execute(ReadHoldingRegistersRequest(start-1, count, slave=unitNo))
+
+        # Exception responses have the error bit (0x80) set in the function code
+        if response.function_code >= 0x80:
+            return ["n.a."] * len(registers)
+
+        # The block is packed into the reused buffer; each value is decoded at its byte offset.
+        # There is no await between packing and decoding, so concurrent reads can share the buffer.
+        buf = self._buffer
+        struct.pack_into(">%dH" % count, buf, 0, *response.registers)
+        decoders = self._decoders
+        return [decoders[dataType](buf, (address - start) * 2) for address, dataType in registers]
+
+
+# Translation table to replace the decimal point by a comma
+_DOT_TO_COMMA = str.maketrans('.', ',')
 
 
 # -------------------------------------------------------------------------------------------------------[ private ]---
 # | Formats the given nuber (powerValue) into a well-formed and readable text                                         |
 # | ----------------------------------------------------------------------------------------------------------------- |
 # | Input parameters:                                                                                                 |
-# | -> powerValue       FLOAT   The value to format                                                                   |
+# | -> powerValue       FLOAT   The value to format (or "n.a." if not available)                                      |
 # | ----------------------------------------------------------------------------------------------------------------- |
 # | Return value:                                                                                                     |
 # | <- formatedText     STRING  A well-formed and readable text containing the powerValue                             |
 # ---------------------------------------------------------------------------------------------------------------------
 def formatPowerText(powerValue):
 
-    formatedText = ""
+    # Values which are not available (e.g. "n.a." of a sleeping inverter at night) are not formatted
+    if not isinstance(powerValue, float):
+        return str(powerValue)
 
-    # Over 1000 'kilo Watt' will be displayed instead of 'Watt'
+    # Over 1000 'kilo Watt' will be displayed instead of 'Watt' (with a decimal comma)
     if abs(powerValue) > 1000:
-        formatedText = "{0} kW".format(str('{:0.2f}'.format(powerValue / 1000))).replace('.', ',')
-    else:
-        formatedText = "{0} W".format(str('{:.0f}'.format(powerValue))).replace('.', ',')
+        return f"{powerValue / 1000:.2f} kW".translate(_DOT_TO_COMMA)
 
-    return formatedText
+    return f"{powerValue:.0f} W"
 
 
 # -------------------------------------------------------------------------------------------------------[ private ]---
-# | The Main Entry Point                                                                                              |
+# | Reads the current values from the inverter and the smartmeter and prints them                                     |
+# | ----------------------------------------------------------------------------------------------------------------- |
+# | Input parameters:                                                                                                 |
+# | -> reader           FroniusReader  Reader of the open connection to the fronius inverter                          |
 # ---------------------------------------------------------------------------------------------------------------------
-def main():
+async def printValues(reader):
 
     print ("Current Time: " + datetime.datetime.now().strftime('%H:%M:%S'))
 
-    # Open a new Modbus connection to the fronius inverter (e.g. Symo 10.3)
-    modbusClient = ModbusClient(sys.argv[1], port=502, timeout=10)
-    modbusClient.connect()
-
     # The modbus addresses of the registers are documented in the following lists:
     # - Inverter_Register_Map_Float_v1.0_with_SYMOHYBRID_MODEL_124.xlsx
     # - Meter_Register_Map_Float_v1.0.xlsx
     # Goto: https://www.fronius.com/en/photovoltaics/downloads and search for "Modbus Sunspec Maps, State Codes und Events"
     # Downloads the hole ZIP package and enjoy the documentation ;-)
     #
-    # Note: In this script you have to specify a data type when calling the method getRegisterValue(). This corresponds
+    # Note: In this script you have to specify a data type when calling the method FroniusReader.read(). This corresponds
     #       to the value from the Fronius Excel list (column "Type").
     #
-    #       The optional parameter "unitNo" of method getRegisterValue() is used to specify from which device the
-    #       data is to be read. The default value is 1 which corresponds to the inverter.
+    #       The parameter "unitNo" of method FroniusReader.read() is used to specify from which device the
+    #       data is to be read. The value 1 corresponds to the inverter.
     #       If you want to read data from the SmartMeter, 240 must be used instead.
 
+    # All values of a device are read with a single request (40005 ... 40099 is one contiguous block).
+    # The requests to the inverter and to the smartmeter are independent and are sent concurrently over the same
+    # connection, so the round-trip of the one is hidden behind the other (transaction IDs keep them apart).
+    (manufacturer, deviceModel, versionString, powerProduction), \
+    (smManufacturer, smDeviceModel, smVersionString, powerConsumption) = await asyncio.gather(
+        reader.readValues((
+            (40005, DataType.String32),     # Manufacturer
+            (40021, DataType.String32),     # Device model
+            (40045, DataType.String16),     # SW version of inverter
+            (40092, DataType.Float32),      # AC Power value
+        ), 1),
+        reader.readValues((
+            (40005, DataType.String32),     # Manufacturer
+            (40021, DataType.String32),     # Device model
+            (40045, DataType.String16),     # SW version of smartmeter
+            (40098, DataType.Float32),      # Total power consumption
+        ), 240),
+    )
+
     # Manufacturer + Device model of the inverter
-    manufacturer = getRegisterValue(modbusClient, 40005, DataType.String32, 1)         # Manufacturer
-    deviceModel = getRegisterValue(modbusClient, 40021, DataType.String32, 1)          # Device model
-    versionString = getRegisterValue(modbusClient, 40045, DataType.String16, 1)        # SW version of inverter
     print ("Inverter: " + manufacturer + " - " + deviceModel + " - SW Version: " + versionString)
 
     # Manufacturer + Device model of the SmartMeter
-    manufacturer = getRegisterValue(modbusClient, 40005, DataType.String32, 240)    # Manufacturer
-    deviceModel = getRegisterValue(modbusClient, 40021, DataType.String32, 240)     # Device model
-    versionString = getRegisterValue(modbusClient, 40045, DataType.String16, 240)   # SW version of inverter
-    print ("SmartMeter: " + manufacturer + " - " + deviceModel + " - SW Version: " + versionString)
+    print ("SmartMeter: " + smManufacturer + " - " + smDeviceModel + " - SW Version: " + smVersionString)
 
     # AC Power value of the inverter - Current production in Watt
-    powerProduction = getRegisterValue(modbusClient, 40092, DataType.Float32, 1)
     print ()
     print (powerProduction)
     print ("Production: " + formatPowerText(powerProduction)) # in my case 40092 is the same as 500 because i only have one inverter
 
     # Power consumption in the whole house - Total power consumption in Watt
     # This value must be read from the SmartMeter, as the inverter does not have this information
-    powerConsumption = getRegisterValue(modbusClient, 40098, DataType.Float32, 240)
     print ()
     print (powerConsumption)
     print ("Consumption: " + formatPowerText(powerConsumption))
@@ -169,6 +227,10 @@ def main():
     # A positive value means that electricity is delivered to the grid.
     # A negative value means that power is being taken from the grid.
     print ()
+    if not (isinstance(powerProduction, float) and isinstance(powerConsumption, float)):
+        print ("The power difference is not available")
+        return
+
     try:
         powerDifference = powerProduction - powerConsumption
 
@@ -180,26 +242,62 @@ def main():
     except Exception as e:
         print ("Unexpected error occured while calculate the 'powerDifference': " + str(e))
 
-#    print("- AC Phase A   Current    : " + str(int(getRegisterValue(modbusClient, 40074, DataType.Float32))) + " A")
-#    print("- AC Phase B   Current    : " + str(int(getRegisterValue(modbusClient, 40076, DataType.Float32))) + " A")
-#    print("- AC Phase C   Current    : " + str(int(getRegisterValue(modbusClient, 40078, DataType.Float32))) + " A")
+#    print("- AC Phase A   Current    : " + str(int(await reader.read(40074, DataType.Float32, 1))) + " A")
+#    print("- AC Phase B   Current    : " + str(int(await reader.read(40076, DataType.Float32, 1))) + " A")
+#    print("- AC Phase C   Current    : " + str(int(await reader.read(40078, DataType.Float32, 1))) + " A")
+
+#    print("- AC Phase A <-> B        : " + str(int(await reader.read(40080, DataType.Float32, 1))) + " V")
+#    print("- AC Phase B <-> C        : " + str(int(await reader.read(40082, DataType.Float32, 1))) + " V")
+#    print("- AC Phase C <-> A        : " + str(int(await reader.read(40084, DataType.Float32, 1))) + " V")
+
+#    print("- AC Phase A <-> n        : " + str(int(await reader.read(40086, DataType.Float32, 1))) + " V")
+#    print("- AC Phase B <-> n        : " + str(int(await reader.read(40088, DataType.Float32, 1))) + " V")
+#    print("- AC Phase C <-> n        : " + str(int(await reader.read(40090, DataType.Float32, 1))) + " V")
+
+#    print("- AC Power                : " + str(int(await reader.read(40092, DataType.Float32, 1))) + " W")
+#    print("- AC Frequency            : " + str(int(await reader.read(40094, DataType.Float32, 1))) + " Hz")
+
+
+# -------------------------------------------------------------------------------------------------------[ private ]---
+# | The Main Entry Point                                                                                              |
+# ---------------------------------------------------------------------------------------------------------------------
+async def main():
+
+    # Optional polling interval in seconds; without it the values are read only once.
+    interval = float(sys.argv[2]) if len(sys.argv) > 2 else None
+
+    # Open a new Modbus connection to the fronius inverter (e.g. Symo 10.3)
+    # The connection is kept open between the polls and only re-established if it was lost.
+    modbusClient = ModbusClient(sys.argv[1], port=502, timeout=10)
+    reader = FroniusReader(modbusClient)
+
+    try:
+        while True:
+            try:
+                if not modbusClient.connected and not await modbusClient.connect():
+                    raise ConnectionException("Unable to connect to " + sys.argv[1])
 
-#    print("- AC Phase A <-> B        : " + str(int(getRegisterValue(modbusClient, 40080, DataType.Float32))) + " V")
-#    print("- AC Phase B <-> C        : " + str(int(getRegisterValue(modbusClient, 40082, DataType.Float32))) + " V")
-#    print("- AC Phase C <-> A        : " + str(int(getRegisterValue(modbusClient, 40084, DataType.Float32))) + " V")
+                await printValues(reader)
 
-#    print("- AC Phase A <-> n        : " + str(int(getRegisterValue(modbusClient, 40086, DataType.Float32))) + " V")
-#    print("- AC Phase B <-> n        : " + str(int(getRegisterValue(modbusClient, 40088, DataType.Float32))) + " V")
-#    print("- AC Phase C <-> n        : " + str(int(getRegisterValue(modbusClient, 40090, DataType.Float32))) + " V")
+            except (ConnectionException, ModbusIOException) as e:
+                if interval is None:
+                    raise
+                # A lost connection or a timeout must not stop the polling: the connection is
+                # closed and re-established with the next poll.
+                print ("Error occured while reading the values: " + str(e))
+                modbusClient.close()
 
-#    print("- AC Power                : " + str(int(getRegisterValue(modbusClient, 40092, DataType.Float32))) + " W")
-#    print("- AC Frequency            : " + str(int(getRegisterValue(modbusClient, 40094, DataType.Float32))) + " Hz")
+            if interval is None:
+                break
+            print ()
+            await asyncio.sleep(interval)
 
-    # Close the connection
-    modbusClient.close()
+    finally:
+        # Close the connection
+        modbusClient.close()
 
 
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 # | Call the main function to start this script                                                                       |
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
-main()
+asyncio.run(main())
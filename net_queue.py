@@ -7,32 +7,43 @@ import threading
 import time
 import queue
 import socket
-import struct
-import urllib.parse
+import re
 import datetime
-import queue
+import collections
+import itertools
 
 import logging
 _logger = logging.getLogger(__name__)
 _logger = logging.LoggerAdapter(_logger, extra={"facility": "network"})
 
+# "%xx" escapes of HTTP request lines and a lookup table for their single-byte equivalents
+_PCT = re.compile(rb"%([0-9A-Fa-f]{2})")
+_PCT_BYTES = {(a + b).encode(): bytes((int(a + b, 16),))
+              for a in "0123456789abcdefABCDEF" for b in "0123456789abcdefABCDEF"}
+
 
 class Notify:
-    """ Class to notify other thread per pipe.
+    """ Class to notify other thread per eventfd (or per pipe, if eventfd is not available).
     """
 
     #_recvfd = None  # File descriptor to watch
-    #_sendfd = None  # File descriptor to notify
+    #_sendfd = None  # File descriptor to notify (same as _recvfd for an eventfd)
  
     def __init__(self):
-        # Create a new pipe
-        self._recvfd, self._sendfd = os.pipe()
-        fcntl.fcntl(self._sendfd, fcntl.F_SETFL, os.O_NONBLOCK)
+        if hasattr(os, "eventfd"):
+            # Create a new eventfd (Linux, Python 3.10+)
+            self._recvfd = self._sendfd = os.eventfd(0, os.EFD_NONBLOCK | os.EFD_CLOEXEC)
+        else:
+            # Create a new pipe
+            self._recvfd, self._sendfd = os.pipe()
+            fcntl.fcntl(self._recvfd, fcntl.F_SETFL, os.O_NONBLOCK)
+            fcntl.fcntl(self._sendfd, fcntl.F_SETFL, os.O_NONBLOCK)
 
     def __del__(self):
         # Close the file descriptors
         os.close(self._recvfd)
-        os.close(self._sendfd)
+        if self._sendfd != self._recvfd:
+            os.close(self._sendfd)
 
     @property
     def notify_fd(self):
@@ -46,10 +57,28 @@ class Notify:
     def notify(self):
         """ Writes a notify event to the file descriptor.
 
-        :returns: The number of written bytes; should be 1 in case of success.
+        :returns: 1 in case of success (0 if there are already enough pending events).
         :rtype: ``int``
         """
-        return os.write(self._sendfd, b"1")
+        try:
+            if self._sendfd == self._recvfd:
+                os.eventfd_write(self._sendfd, 1)
+                return 1
+            return os.write(self._sendfd, b"1")
+        except BlockingIOError:
+            return 0
+
+    def clear(self):
+        """ Removes all pending notify events from the file descriptor.
+        """
+        try:
+            if self._sendfd == self._recvfd:
+                os.eventfd_read(self._recvfd)  # resets the counter with a single read
+                return
+            while os.read(self._recvfd, 4096):
+                pass
+        except BlockingIOError:
+            pass
 
 
 class NetMessage:
@@ -57,29 +86,68 @@ class NetMessage:
 
     :param is_http: Defines whether this is a HTTP message or not.
     :type is_http: bool
+    :param on_result: Optional callable which is invoked (without arguments) after a
+        result has been set, e.g. to wake up the thread sending the result.
+    :type on_result: callable
     """
 
+    _pool = collections.deque(maxlen=1024)  # released messages, see :meth:`acquire`
+
     #_is_http = False
-    #_condition = None
+    #_done = None
     #_listening = False
     #_listen_since = None
     #_disconnect = False
-    #_request = ""
+    #_request = bytearray()
     #_result = None
 
-    def __init__(self, is_http):
+    def __init__(self, is_http, on_result=None):
         assert isinstance(is_http, bool)
         self._is_http = is_http
-        self._condition = threading.Condition()
+        self._on_result = on_result
+        self._done = threading.Event()  # set when a new result is available
         self._listening = False
         self._listen_since = None
         self._disconnect = False
-        self._request = ""
+        self._request = bytearray()  # received bytes (without "\r"), appended in place
         self._result = None
 
     def __del__(self):
         pass  # nothing to do!
 
+    @classmethod
+    def acquire(cls, is_http, on_result=None):
+        """ Returns a released message for reuse or a new one, if there is none.
+
+        :param is_http: Defines whether this is a HTTP message or not.
+        :type is_http: bool
+        :param on_result: Optional callable which is invoked after a result has been set.
+        :type on_result: callable
+        :returns: The message.
+        :rtype: :class:`NetMessage`
+        """
+        assert isinstance(is_http, bool)
+        try:
+            message = cls._pool.pop()
+        except IndexError:
+            return cls(is_http, on_result)
+        message._is_http = is_http
+        message._on_result = on_result
+        return message
+
+    def release(self):
+        """ Resets the message and puts it back for reuse by :meth:`acquire`; the message must
+        not be used anymore afterwards (e.g. it must not be waiting for a result).
+        """
+        self._on_result = None
+        self._done.clear()
+        self._listening = False
+        self._listen_since = None
+        self._disconnect = False
+        self._request.clear()
+        self._result = None
+        NetMessage._pool.append(self)
+
     def is_http(self):
         """ Returns whether this is a HTTP message or not.
 
@@ -95,7 +163,7 @@ class NetMessage:
         :returns: The request string.
         :rtype: ``str``
         """
-        return self._request
+        return self._request.decode("utf-8", "replace")
 
     def is_listening(self):
         """ Returns whether the client is in listening mode.
@@ -118,48 +186,52 @@ class NetMessage:
         """ Adds request data received from the client.
 
         :param request: The request data from the client.
-        :type request: str
+        :type request: bytes or bytearray or memoryview
         :returns: :const:`True` when the request is complete and the response shall be prepared,
             :const:`False` otherwise.
         :rtype: ``bool``
         """
-        assert isinstance(request, str)
-        self._request += request.replace("\r", "")  # remove all "\r"
-        pos = self._request.find("\n\n" if self._is_http else "\n")
+        assert isinstance(request, (bytes, bytearray, memoryview))
+        start = len(self._request)
+        self._request += request
+        if self._request.find(b"\r", start) != -1:
+            self._request[start:] = self._request[start:].translate(None, b"\r")  # remove all "\r"
+        pos = self._request.find(b"\n\n" if self._is_http else b"\n")
         if pos != -1:
             if self._is_http:
-                pos = self._request.find("\n")
-                self._request = self._request[:pos]  # reduce to first line
+                pos = self._request.find(b"\n")
+                line = self._request[:pos]  # reduce to first line
                 # typical first line: GET /ehp/outsidetemp HTTP/1.1  # TODO
-                pos = self._request.rfind(" HTTP/")
+                pos = line.rfind(b" HTTP/")
                 if pos != -1:
-                    self._request = self._request[:pos]  # remove " HTTP/x.x" suffix
+                    del line[pos:]  # remove " HTTP/x.x" suffix
                 # replace "%xx" escapes by their single-character equivalent
-                self._request = urllib.parse.unquote(self._request)
+                if b"%" in line:
+                    line = bytearray(_PCT.sub(lambda m: _PCT_BYTES[m.group(1)], line))
+                self._request = line
             elif pos + 1 == len(self._request):
-                self._request = self._request[:pos]  # reduce to complete lines
+                del self._request[pos:]  # reduce to complete lines
             return True
         return len(self._request) == 0 and self._listening
 
     def get_result(self):
-        """ Wait for the result being set and return the result string.
+        """ Wait for the result being set and return the result.
 
-        :returns: The result string.
-        :rtype: ``str``
+        :returns: The result (ready to be sent).
+        :rtype: ``bytes``
         """
-        with self._condition:
-            if self._result is None:
-                self._condition.wait()  # wait until result becomes available
-            self._request = ""
-            ret = self._result
-            self._result = None
-            return ret
+        self._done.wait()  # wait until result becomes available
+        self._done.clear()
+        self._request.clear()
+        ret = self._result
+        self._result = None
+        return ret
 
     def set_result(self, result, listening, listen_until, disconnect):
-        """ Sets the result string and notify the waiting thread.
+        """ Sets the result and notify the waiting thread.
 
-        :param result: The result string.
-        :type result: str
+        :param result: The result; a string is encoded (ASCII) once here.
+        :type result: bytes or str
         :param listening: Defines whether the client is in listening mode or not.
         :type listening: bool
         :param listen_until: The end time to which updates were added (exclusive).
@@ -168,16 +240,17 @@ class NetMessage:
             :const:`False` otherwise.
         :type disconnect: bool
         """
-        assert isinstance(result, str)
+        assert isinstance(result, (bytes, str))
         assert isinstance(listening, bool)
         assert listen_until is None or isinstance(listen_until, datetime.datetime)
         assert isinstance(disconnect, bool)
-        with self._condition:
-            self._result = result
-            self._listening = listening
-            self._listen_since = listen_until
-            self._disconnect = disconnect
-            self._condition.notify()  # signal that a new result is available
+        self._result = result.encode("ascii") if isinstance(result, str) else result
+        self._listening = listening
+        self._listen_since = listen_until
+        self._disconnect = disconnect
+        self._done.set()  # signal that a new result is available
+        if self._on_result:
+            self._on_result()
 
 
 class TcpSocket:
@@ -188,15 +261,29 @@ class TcpSocket:
     """
 
     #_socket = None  # the socket instance
+    #_fd = -1  # the file descriptor of the socket (-1 after closing)
+    #_name = None  # the address (IP address, port) of the socket
+    #_sendq = []  # buffered data, which has not been sent yet
+    #_sendq_bytes = 0  # amount of buffered bytes
 
     def __init__(self, sock):
         _logger.debug("TcpSocket.__init__()")
         assert isinstance(sock, socket.socket)
         self._socket = sock
+        self._fd = sock.fileno()
+        self._name = sock.getsockname()
+        self._sendq = []
+        self._sendq_bytes = 0
 
     def __del__(self):
         # Close the socket
         _logger.debug("TcpSocket.__del__()")
+        self.close()
+
+    def close(self):
+        """ Closes the socket.
+        """
+        self._fd = -1
         self._socket.close()
 
     @property
@@ -206,7 +293,7 @@ class TcpSocket:
         :returns: The IP address as ``str``.
         :rtype: ``str``
         """
-        return self._socket.getsockname()[0]
+        return self._name[0]
 
     @property
     def port(self):
@@ -215,7 +302,7 @@ class TcpSocket:
         :returns: The TCP port number as ``int``.
         :rtype: ``int``
         """
-        return self._socket.getsockname()[1]
+        return self._name[1]
 
     @property
     def socket_fd(self):
@@ -224,7 +311,7 @@ class TcpSocket:
         :returns: The file descriptor of the socket as ``int`` (-1 on failure).
         :rtype: ``int``
         """
-        return self._socket.fileno()
+        return self._fd
 
     def is_valid(self):
         """ Returns whether the file descriptor of the socket is valid or not.
@@ -233,42 +320,85 @@ class TcpSocket:
             :const:`False` otherwise.
         :rtype: ``bool``
         """
-        return fcntl.fcntl(self._socket.fileno(), fcntl.F_GETFL) != -1
+        return self._fd != -1
 
     def set_timeout(self, timeout):
-        """ Sets the timeout for :func:`send` and :func:`recv`.
+        """ Sets the timeout for blocking operations on the socket (not used for the sockets
+        served by a :class:`Reactor`, which never block).
 
         :param timeout: The timeout value in seconds as ``int`` or ``float``.
         :type timeout: int or float
         """
         assert isinstance(timeout, (int, float))
-        tv_sec = int(timeout)  # seconds
-        tv_usec = int((timeout - tv_sec) * 1e6)  # microseconds
-        timeval = struct.pack("LL", tv_sec, tv_usec)
-        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVTIMEO, timeval)
-        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_SNDTIMEO, timeval)
+        self._socket.settimeout(timeout)
 
     def send(self, data):
-        """ Writes a string to the socket.
+        """ Adds data to the send buffer of the socket; see :meth:`flush`.
 
-        :param data: The provided string.
-        :type data: str
-        :returns: The number of sent bytes.
+        :param data: The provided data (must not be modified until it has been sent).
+        :type data: bytes or bytearray or memoryview
+        :returns: The number of buffered bytes.
         :rtype: ``int``
         """
-        return self._socket.send(data.encode("ascii"), socket.MSG_NOSIGNAL)
+        assert isinstance(data, (bytes, bytearray, memoryview))
+        self._sendq.append(data)
+        self._sendq_bytes += len(data)
+        return len(data)
+
+    def flush(self):
+        """ Writes as much of the send buffer as possible to the socket without blocking
+        (all buffered data with a single system call).
+
+        :returns: The number of bytes remaining in the send buffer.
+        :rtype: ``int``
+        """
+        while self._sendq:
+            try:
+                sent = self._socket.sendmsg(self._sendq,
+                                           (), socket.MSG_NOSIGNAL | socket.MSG_DONTWAIT)
+            except BlockingIOError:
+                break
+            self._sendq_bytes -= sent
+            # drop the sent prefix of the buffer
+            while sent:
+                if sent >= len(self._sendq[0]):
+                    sent -= len(self._sendq.pop(0))
+                else:
+                    self._sendq[0] = memoryview(self._sendq[0])[sent:]  # no copy of the rest
+                    sent = 0
+        return self._sendq_bytes
+
+    @property
+    def send_pending(self):
+        """ Returns the number of bytes in the send buffer.
+
+        :returns: The number of buffered bytes.
+        :rtype: ``int``
+        """
+        return self._sendq_bytes
 
     def recv(self, len):
-        """ Reads a defined amount of bytes/characters from the socket.
+        """ Reads up to a defined amount of bytes from the socket without blocking.
 
-        :param len: The amount of bytes/characters to read.
+        :param len: The amount of bytes to read.
         :type len: int
-        :returns: The read byte array as string.
-        :rtype: ``str``
+        :returns: The read bytes.
+        :rtype: ``bytes``
+        :raises BlockingIOError: If no data is available.
         """
         assert isinstance(len, int)
-        data = self._socket.recv(len)
-        return data.decode("ascii")
+        return self._socket.recv(len, socket.MSG_DONTWAIT)
+
+    def recv_into(self, buffer):
+        """ Reads bytes from the socket into a buffer without blocking.
+
+        :param buffer: The buffer to read into (up to its size).
+        :type buffer: bytearray or memoryview
+        :returns: The number of read bytes (0 if the socket has been closed by the peer).
+        :rtype: ``int``
+        :raises BlockingIOError: If no data is available.
+        """
+        return self._socket.recv_into(buffer, 0, socket.MSG_DONTWAIT)
 
     def __repr__(self):
         return repr(self._socket)
@@ -294,7 +424,7 @@ class TcpServer:
     #_listening = False  # defines whether the object is listening or not
     #_socket = None      # the socket of the network server
 
-    def __init__(self, port, addr, backlog=5):
+    def __init__(self, port, addr, backlog=socket.SOMAXCONN):
         _logger.debug("TcpServer.__init__()")
         assert isinstance(port, int)
         assert isinstance(addr, str)
@@ -319,6 +449,7 @@ class TcpServer:
         try:
             self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
             self._socket.bind((self._addr, self._port))
             self._socket.listen(self._backlog)
             self._listening = True
@@ -329,6 +460,31 @@ class TcpServer:
             self._socket = None
             raise
 
+    def check_unused(self):
+        """ Checks that no other socket listens on the port yet. This must be done before the
+        first server is started, since servers bound with ``SO_REUSEPORT`` would silently share
+        the port with another server (e.g. a second daemon started by mistake).
+
+        :raises OSError: If the port is already in use.
+        """
+        probe = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        try:
+            probe.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            probe.bind((self._addr, self._port))  # without SO_REUSEPORT -> EADDRINUSE if in use
+        except OSError as ex:
+            _logger.error("failed to start TCP server: {!s}".format(ex))
+            raise
+        finally:
+            probe.close()
+
+    def close(self):
+        """ Stops listening and closes the socket of the server.
+        """
+        self._listening = False
+        if self._socket:
+            self._socket.close()
+            self._socket = None
+
     def new_socket(self):
         """ Accepts an incoming connection request and creates a local TCP socket for communication.
 
@@ -339,6 +495,7 @@ class TcpServer:
             return None
         try:
             sock, _ = self._socket.accept()
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)  # small responses, no Nagle delay
             return TcpSocket(sock)
         except OSError:
             return None
@@ -353,29 +510,55 @@ class TcpServer:
         return -1 if not self._listening else self._socket.fileno()
 
 
-class Connection(threading.Thread):
-    """ TODO doc
+class Connection:
+    """ Class for a client connection, which is served by a :class:`Reactor` thread.
+
+    The connection does not block: received data is collected into the :class:`NetMessage`,
+    complete requests are put into the network queue and the result is sent by :meth:`on_result`
+    once the :class:`Reactor` thread got notified about it.
+
+    :param sock: The socket of the client.
+    :type sock: TcpSocket
+    :param is_http: Defines whether this is a HTTP connection or not.
+    :type is_http: bool
+    :param net_queue: The queue to put the complete requests to.
+    :type net_queue: queue.SimpleQueue or queue.Queue
+    :param on_result: Callable invoked with the connection as argument when the result
+        of a request is available (called from the thread setting the result).
+    :type on_result: callable
     """
 
-    #_notify = None
     #_socket = None
     #_is_http = False
     #_net_queue = None
+    #_message = None
+    #_pending = False
+    #_buffer = bytearray(4096)
+    #_view = memoryview(_buffer)
+    #_eof = False
+    #_closing = False
+    #_alive = True
     #_id = 0
-    _ids = 0
+    _ids = itertools.count(1)  # next() is atomic, connections are created by several reactors
 
-    def __init__(self, sock, is_http, net_queue):
+    def __init__(self, sock, is_http, net_queue, on_result):
         _logger.debug("Connection.__init__()")
         assert isinstance(sock, TcpSocket)
         assert isinstance(is_http, bool)
-        assert isinstance(net_queue, queue.Queue)
-        threading.Thread.__init__(self, name="Connection-Thread<{}:{:d}>".format(sock.ip_addr, sock.port))
-        self._notify = Notify()
+        assert isinstance(net_queue, (queue.SimpleQueue, queue.Queue))
+        self._name = "Connection<{}:{:d}>".format(sock.ip_addr, sock.port)
         self._socket = sock
+        self._fd = sock.socket_fd  # still needed to unregister the socket after it got closed
         self._is_http = is_http
         self._net_queue = net_queue
-        Connection._ids += 1
-        self._id = Connection._ids
+        self._message = NetMessage.acquire(is_http, lambda: on_result(self))
+        self._pending = False  # request is waiting for its result
+        self._buffer = bytearray(4096)  # receive buffer, reused for every read
+        self._view = memoryview(self._buffer)
+        self._eof = False  # client closed its side of the connection
+        self._closing = False  # close after the send buffer has been flushed
+        self._alive = True
+        self._id = next(Connection._ids)
 
     def __del__(self):
         _logger.debug("Connection.__del__()")
@@ -390,145 +573,377 @@ class Connection(threading.Thread):
         """
         return self._id
 
+    @property
+    def socket_fd(self):
+        """ Returns the file descriptor of the client socket.
+
+        :returns: The file descriptor of the client socket as ``int``.
+        :rtype: ``int``
+        """
+        return self._fd
+
+    def is_alive(self):
+        """ Returns whether the connection is still open.
+
+        :returns: :const:`True` if the connection is open, :const:`False` otherwise.
+        :rtype: ``bool``
+        """
+        return self._alive
+
     def stop(self):
-        """ TODO doc
+        """ Closes the connection.
         """
-        self._notify.notify()
+        if self._alive:
+            self._alive = False
+            self._socket.close()
+            if not self._pending:  # otherwise a result may still be set by another thread
+                self._message.release()
+            self._message = None
+            _logger.info("[{:d}] connection closed".format(self.id))
+
+    def wants_write(self):
+        """ Returns whether there is buffered data waiting to be sent to the client.
+
+        :returns: :const:`True` if the send buffer is not empty, :const:`False` otherwise.
+        :rtype: ``bool``
+        """
+        return self._alive and self._socket.send_pending > 0
 
     def __repr__(self):
-        return "Connection<{}:{:d}>".format(self._socket.ip_addr, self._socket.port)
+        return self._name
 
-    def run(self):
-        _logger.debug("Connection.run()")
-        rlist = [self._notify.notify_fd, self._socket.socket_fd]
-        xlist = rlist
-
-        closed = False
-        message = NetMessage(self._is_http)
-
-        while not closed:
-            readable, _, exceptional = select.select(rlist, [], xlist, 2)  # timeout = 2s
-            if self._notify.notify_fd in (readable + exceptional):
-                break  # notification for shutdown received!
-            new_data = self._socket.socket_fd in readable
-            closed = self._socket.socket_fd in exceptional
-
-            if new_data or message.is_listening():
-                if not self._socket.is_valid():
-                    break
-                data = ""
-                if new_data:
-                    data = self._socket.recv(1024)  # TODO: try/except needed?
-                    if len(data) == 0:
-                        break  # remove closed socket
-                    _logger.debug("[{:d}] received data {!r}".format(self.id, data))
-
-                # decode client data
-                if message.add(data):
-                    _logger.debug("[{:d}] new request {!r}".format(self.id, message.request))
-                    self._net_queue.put(message)
-                    # wait for result
-                    _logger.debug("[{:d}] wait for result ...".format(self.id))
-                    result = message.get_result()
-                    _logger.debug("[{:d}] get result {!r}".format(self.id, result))
-                    if not self._socket.is_valid():
-                        break
-                    self._socket.send(result)  # TODO: try/except needed?
-
-                if message.is_disconnect() or not self._socket.is_valid():
-                    break
-
-        _logger.info("[{:d}] connection closed".format(self.id))
+    def on_readable(self):
+        """ Reads all available data from the (edge-triggered) client socket and processes it.
 
+        Nothing is read while a request is pending or the connection is closing, so the data
+        stays in the socket (TCP flow control throttles the client); :meth:`on_result` reads
+        it after the result has been sent.
+        """
+        # read everything available, the event is not repeated for data left in the socket
+        while self._alive and not self._pending and not self._closing:
+            try:
+                n = self._socket.recv_into(self._view)
+            except BlockingIOError:
+                break  # socket drained
+            except OSError:
+                self._eof = True  # broken socket
+                break
+            if n == 0:
+                self._eof = True  # closed socket
+                break
+            data = self._view[:n]
+            if _logger.isEnabledFor(logging.DEBUG):  # avoid copying the data otherwise
+                _logger.debug("[{:d}] received data {!r}".format(self.id, bytes(data)))
 
-class Network(threading.Thread):
+            self._process(data)
+        self._check_done()
+
+    def on_result(self):
+        """ Sends the result of the pending request to the client.
+        """
+        if not self._pending or not self._alive:
+            return
+        result = self._message.get_result()
+        self._pending = False
+        _logger.debug("[{:d}] get result {!r}".format(self.id, result))
+        self._socket.send(result)
+        self._flush()  # EPOLLOUT is only needed for what the socket does not take at once
+        if self._message.is_disconnect():
+            self._closing = True
+            self._check_done()
+        else:
+            self.on_readable()  # data left in the socket while the request was pending
+
+    def on_writable(self):
+        """ Sends the buffered data to the client.
+        """
+        if self._alive:
+            self._flush()
+            self._check_done()
+
+    def on_idle(self):
+        """ Lets a client in listening mode ask for new updates.
+        """
+        if self._alive and not self._pending and self._message.is_listening()[0]:
+            self._process(b"")
+
+    def _flush(self):
+        try:
+            self._socket.flush()
+        except OSError:
+            self.stop()  # broken socket
+
+    def _check_done(self):
+        # close the connection if nothing is left to do
+        if (self._eof or self._closing) and not self._pending and not self.wants_write():
+            self.stop()
+
+    def _process(self, data):
+        # decode client data
+        if self._message.add(data):
+            _logger.debug("[{:d}] new request {!r}".format(self.id, self._message.request))
+            self._pending = True
+            self._net_queue.put(self._message)
+
+
+class Reactor(threading.Thread):
+    """ Class for a reactor thread, which accepts new connections on its own listening sockets
+    and serves all of them.
+
+    The thread waits with epoll for the listening sockets, all client sockets and a notify
+    event. Results set by other threads are delivered through the notify event, so the thread
+    never blocks on a single connection.
+
+    :param tcp_server: The listening TCP server.
+    :type tcp_server: TcpServer
+    :param http_server: The listening HTTP server or ``None``.
+    :type http_server: TcpServer
+    :param net_queue: The queue to put the complete requests to.
+    :type net_queue: queue.SimpleQueue or queue.Queue
+    :param name: The name of the thread.
+    :type name: str
+    """
 
     #_notify = None
     #_connections = []
     #_net_queue = None
     #_tcp_server = None
     #_http_server = None
-    #_listening = False
+    #_running = False
+    #_epoll = None
+    #_handlers = {}
+    #_writers = set()
+    #_results = deque()
+
+    def __init__(self, tcp_server, http_server, net_queue, name):
+        assert isinstance(tcp_server, TcpServer)
+        assert http_server is None or isinstance(http_server, TcpServer)
+        assert isinstance(net_queue, (queue.SimpleQueue, queue.Queue))
+        _logger.debug("Reactor.__init__()")
+        threading.Thread.__init__(self, name=name)
+        self._notify = Notify()
+        self._connections = []
+        self._net_queue = net_queue
+        self._tcp_server = tcp_server
+        self._http_server = http_server
+        self._running = True
+        self._results = collections.deque()  # connections with an available result
+        self._handlers = {}  # file descriptor -> TcpServer or Connection
+        self._writers = set()  # file descriptors registered for EPOLLOUT
+        # epoll is kept as the only backend: an io_uring reactor would need third party
+        # bindings and would rather pay off only for a server saturating its CPU
+        self._epoll = select.epoll()
+        self._epoll.register(self._notify.notify_fd, select.EPOLLIN)
+        for server in (self._tcp_server, self._http_server):
+            if server:
+                self._epoll.register(server.socket_fd, select.EPOLLIN)
+                self._handlers[server.socket_fd] = server
+
+    def run(self):
+        _logger.debug("Reactor.run()")
+        notify_fd = self._notify.notify_fd
+        next_cleanup = time.monotonic() + 1
+        next_listen = time.monotonic() + 2
+        while self._running:
+            for fd, events in self._epoll.poll(1):  # timeout = 1s
+                if fd == notify_fd:
+                    self._notify.clear()
+                    self._deliver_results()
+                    continue
+                handler = self._handlers.get(fd)
+                if isinstance(handler, TcpServer):
+                    self._accept(handler)
+                elif handler is not None:
+                    if events & select.EPOLLOUT:
+                        handler.on_writable()
+                    if events & ~select.EPOLLOUT:
+                        handler.on_readable()
+                    self._update(handler)
+            now = time.monotonic()
+            if now >= next_listen:  # let clients in listening mode ask for updates
+                next_listen = now + 2
+                for conn in self._connections:
+                    conn.on_idle()
+                    self._update(conn)
+            if now >= next_cleanup:  # perform a cleanup of all connections
+                next_cleanup = now + 1
+                self.clean_connections()
+        _logger.debug("Reactor.run(): shutdown")
 
-    def __init__(self, local, port, http_port, net_queue):
+    def stop(self):
+        _logger.debug("Reactor.stop()")
+        self._running = False
+        self._notify.notify()
+
+    def close(self):
+        """ Closes the listening sockets, sends the results set in the meantime (e.g. the errors
+        of the requests pending at shutdown) and closes all connections; must be called after the
+        thread has finished.
+        """
+        _logger.debug("Reactor.close()")
+        for server in (self._tcp_server, self._http_server):
+            if server:
+                server.close()  # no more connections are queued in the backlog of the socket
+        self._deliver_results()
+        for conn in self._connections:
+            conn.on_writable()  # send what is left in the send buffer (without blocking)
+            self._remove(conn)
+        self.clean_connections()
+        self._epoll.close()
+
+    def clean_connections(self):
+        if not self._connections:
+            return
+        # partition in place: keep the alive connections at the front
+        dead_conn = []
+        i = 0
+        for conn in self._connections:
+            if conn.is_alive():
+                self._connections[i] = conn
+                i += 1
+            else:
+                dead_conn.append(conn)
+        del self._connections[i:]
+        if dead_conn:
+            _logger.debug("removed {:d} dead connection(s) {}".format(len(dead_conn), dead_conn))
+
+    def _accept(self, server):
+        is_http = server is self._http_server
+        _logger.debug("Reactor.run(): new {} connection".format("HTTP" if is_http else "TCP"))
+        sock = server.new_socket()
+        if not sock:
+            return
+        conn = Connection(sock, is_http, self._net_queue, self._result_ready)
+        _logger.info("Reactor.run(): new connection {}".format(conn))
+        self._handlers[conn.socket_fd] = conn
+        self._epoll.register(conn.socket_fd, select.EPOLLIN | select.EPOLLET)
+        self._connections.append(conn)
+        conn.on_readable()  # data may have arrived before the registration
+        self._update(conn)
+
+    def _update(self, conn):
+        # remove a closed connection or (un)register it for EPOLLOUT depending on its send buffer
+        if not conn.is_alive():
+            self._remove(conn)
+            return
+        fd = conn.socket_fd
+        if conn.wants_write() != (fd in self._writers):
+            if fd in self._writers:
+                self._writers.discard(fd)
+                self._epoll.modify(fd, select.EPOLLIN | select.EPOLLET)
+            else:
+                self._writers.add(fd)
+                self._epoll.modify(fd, select.EPOLLIN | select.EPOLLOUT | select.EPOLLET)
+
+    def _remove(self, conn):
+        fd = conn.socket_fd
+        if self._handlers.get(fd) is conn:
+            del self._handlers[fd]
+            self._writers.discard(fd)
+            try:
+                self._epoll.unregister(fd)
+            except (OSError, ValueError):
+                pass  # already closed
+        conn.stop()
+
+    def _result_ready(self, conn):
+        # called by the thread setting the result -> wake up the reactor thread
+        self._results.append(conn)
+        self._notify.notify()
+
+    def _deliver_results(self):
+        while self._results:
+            conn = self._results.popleft()
+            conn.on_result()
+            self._update(conn)
+
+
+class Network(threading.Thread):
+    """ Class for the network thread, which supervises the reactor threads serving the connections.
+
+    Every reactor has its own listening sockets bound with ``SO_REUSEPORT``, so the kernel
+    distributes the incoming connections among the reactors. Since such a port could be shared
+    with another process too, the ports are checked to be unused before the first server is
+    started (a second daemon started by mistake fails with ``EADDRINUSE``).
+    The network queue is shared by all reactors.
+
+    :param local: Defines whether the TCP server listens on localhost only or not.
+    :type local: bool
+    :param port: The port number of the TCP server.
+    :type port: int
+    :param http_port: The port number of the HTTP server (0 or less disables the HTTP server).
+    :type http_port: int
+    :param net_queue: The queue to put the complete requests to; a :class:`queue.SimpleQueue`
+        avoids the locking overhead of :class:`queue.Queue` (which must not be bounded, since
+        the reactors must never block when putting a request).
+    :type net_queue: queue.SimpleQueue or queue.Queue
+    :param reactors: The number of reactor threads (default: number of CPUs).
+    :type reactors: int
+    """
+
+    #_net_queue = None
+    #_reactors = []
+    #_stopped = None
+
+    def __init__(self, local, port, http_port, net_queue, reactors=None):
         assert isinstance(local, bool)
         assert isinstance(port, int)
         assert isinstance(http_port, int)
-        assert isinstance(net_queue, queue.Queue)
+        assert isinstance(net_queue, (queue.SimpleQueue, queue.Queue))
+        assert reactors is None or isinstance(reactors, int)
         _logger.debug("Network.__init__()")
         threading.Thread.__init__(self, name="Network-Thread")
-        self._notify = Notify()
-        self._connections = []
         self._net_queue = net_queue
-        self._tcp_server = TcpServer(port, "127.0.0.1" if local else "")
-        self._tcp_server.start()
-        self._listening = True
-        if http_port > 0:
-            self._http_server = TcpServer(http_port, "")
-            self._http_server.start()
-        else:
-            self._http_server = None
-        # TODO: possible problem if _listening = True, but start of _http_server failed?!
-
-    def __del__(self):
-        _logger.debug("Network.__del__()")
+        self._stopped = threading.Event()
+        if reactors is None:
+            reactors = os.cpu_count() or 1
+        self._reactors = []
+        for i in range(max(reactors, 1)):
+            tcp_server = TcpServer(port, "127.0.0.1" if local else "")
+            if i == 0:
+                tcp_server.check_unused()
+            tcp_server.start()
+            if http_port > 0:
+                http_server = TcpServer(http_port, "")
+                if i == 0:
+                    http_server.check_unused()
+                http_server.start()
+            else:
+                http_server = None
+            self._reactors.append(
+                Reactor(tcp_server, http_server, net_queue, "Reactor-Thread-{:d}".format(i)))
+
+    def close(self):
+        """ Stops the network thread and all reactor threads, answers all pending requests
+        with an error and closes all connections.
+        """
+        _logger.debug("Network.close()")
         self.stop()
+        if self.ident is not None:  # thread has been started
+            self.join()  # all reactors have finished, no more requests are read
         while True:
             try:
                 message = self._net_queue.get_nowait()
                 message.set_result("ERR: shutdown", False, None, True)
             except queue.Empty:
                 break
-        while len(self._connections) > 0:
-            conn = self._connections.pop()
-            conn.stop()
-            conn.join()
-        self._tcp_server = None
-        self._http_server = None
-        self.join()
+        for reactor in self._reactors:
+            reactor.close()
 
     def run(self):
         _logger.debug("Network.run()")
-        if not self._listening:
-            return
-        rlist = [self._notify.notify_fd, self._tcp_server.socket_fd]
-        if self._http_server:
-            rlist.append(self._http_server.socket_fd)
-        while True:
-            readable, _, _ = select.select(rlist, [], [], 1)  # timeout = 1s
-            if len(readable) == 0:  # timeout -> perform a cleanup of all connections
-                self.clean_connections()
-                continue
-            new_conn = is_http = False
-            if self._notify.notify_fd in readable:
-                _logger.debug("Network.run(): shutdown")
-                return  # shutdown
-            if self._tcp_server.socket_fd in readable:
-                _logger.debug("Network.run(): new TCP connection")
-                new_conn = True
-            elif self._http_server and self._http_server.socket_fd in readable:
-                _logger.debug("Network.run(): new HTTP connection")
-                new_conn = is_http = True
-            if new_conn:
-                sock = self._tcp_server.new_socket()
-                if not sock:
-                    continue
-                conn = Connection(sock, is_http, self._net_queue)
-                _logger.info("Network.run(): new connection {}".format(conn))
-                conn.start()
-                self._connections.append(conn)
-                del sock, conn
+        for reactor in self._reactors:
+            reactor.start()
+        self._stopped.wait()
+        _logger.debug("Network.run(): shutdown")
+        for reactor in self._reactors:
+            reactor.stop()
+        for reactor in self._reactors:
+            reactor.join()
 
     def stop(self):
         _logger.debug("Network.stop()")
-        self._notify.notify()
-        time.sleep(0.1)  # wait for 100ms
-
-    def clean_connections(self):
-        dead_conn = [conn for conn in self._connections if not conn.is_alive()]
-        self._connections = [conn for conn in self._connections if conn not in dead_conn]
-        if dead_conn:
-            _logger.debug("removed {:d} dead connection(s) {}".format(len(dead_conn), dead_conn))
+        self._stopped.set()
 
 
 
@@ -546,7 +961,7 @@ def main():
     )
     try:
         _logger.debug("main #1")
-        q = queue.Queue()
+        q = queue.SimpleQueue()
         network = Network(local=True, port=8888, http_port=0, net_queue=q)
         network.start()
         #_logger.debug("main #2, wait 30s ...")
@@ -559,8 +974,7 @@ def main():
         _logger.debug("main #5")
     except KeyboardInterrupt:
         _logger.debug("KeyboardInterrupt")
-        network.stop()
-        network.join()
+        network.close()
 
 if __name__ == "__main__":
     main()
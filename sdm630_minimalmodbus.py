@@ -1,16 +1,22 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import argparse
+import array
+import functools
+import queue
 import struct
+import sys
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 from timeit import default_timer as timer
 import minimalmodbus
 import serial
 
 
-class ModbusReg:
-    def __init__(self, address, unit):
-        self.address = address
-        self.unit = unit
+ModbusReg = namedtuple("ModbusReg", ["address", "unit"])
 
 # ------------------------------------------------------------------------------------
 #  Dict of all SDM630-Modbus Input Registers (Function Code 04):
@@ -165,49 +171,242 @@ SDM630_REGISTER = {
     #                                     : ModbusReg( 0x017E, unit = None          ),
 }
 
-SDM630_BLOCKS = {
-    0x0000 : 40,
-    0x0050 : 16,
-    0x00C0 : 40,
-    0x0140 : 32,
+# ------------------------------------------------------------------------------------
+#  Refresh divisor of the slowly changing energy counters: they are read every 10th
+#  cycle only (unless they are covered by a batch, which is read anyway); all other
+#  registers are read every cycle.
+#
+SDM630_REFRESH = {
+    name: 10 for name, r in SDM630_REGISTER.items()
+    if 0x0048 <= r.address <= 0x0052 or 0x0156 <= r.address <= 0x017C
 }
 
+# ------------------------------------------------------------------------------------
+#  Batches of registers read with a single request each, computed from the register
+#  addresses: a new batch is started if more than MAX_GAP unused registers would have
+#  to be read in between or if the batch would exceed MAX_COUNT registers.
+#
+_MAX_FC04_WORDS = 125   # registers per request allowed by modbus for FC04 (protocol ceiling)
+SDM630_MAX_GAP = 32      # unused registers which may be read to save a request
+SDM630_MAX_COUNT = 80    # registers per request accepted by the SDM630 (device limit)
 
-def main():
 
-    instr = minimalmodbus.Instrument('/dev/ttyAMA0', 1, minimalmodbus.MODE_RTU) # port name, slave address (in decimal)
-    instr.serial.baudrate = 38400
-    instr.serial.parity = serial.PARITY_NONE
+def plan_batches(addresses, max_gap=SDM630_MAX_GAP, max_count=SDM630_MAX_COUNT):
+    batches = []  # list of (start address, number of registers)
+    max_count = min(max_count, _MAX_FC04_WORDS)  # start a new batch at the modbus limit
+    for addr in sorted(set(addresses)):
+        if batches:
+            start, count = batches[-1]
+            if addr - (start + count) <= max_gap and addr + 2 - start <= max_count:
+                batches[-1] = (start, addr + 2 - start)
+                continue
+        batches.append((addr, 2))
+    return batches
+
+
+def plan_refresh_batches(addresses, divisors):
+    # plan the batches of the registers with the lowest divisor first; registers covered by
+    # these batches are refreshed with them, the others get batches of their own divisor
+    batches = []  # list of (start address, number of registers, refresh divisor)
+    for divisor in sorted(set(divisors)):
+        pending = [a for a, d in zip(addresses, divisors) if d == divisor
+                   and not any(s <= a < s + c for s, c, _ in batches)]
+        batches += [(s, c, divisor) for s, c in plan_batches(pending)]
+    return sorted(batches)
+
+# ------------------------------------------------------------------------------------
+#  Index aligned tuples (structure of arrays) of all registers in order of their
+#  modbus address: name, address, unit suffix ("" or " " + unit) and refresh divisor
+#
+_ADDRESSES, _NAMES, _UNIT_SUFFIXES, _DIVISORS = zip(*sorted(
+    (r.address, name, "" if r.unit is None else " " + r.unit, SDM630_REFRESH.get(name, 1))
+    for name, r in SDM630_REGISTER.items()))
+
+SDM630_BATCHES = plan_refresh_batches(_ADDRESSES, _DIVISORS)
+assert all(count <= SDM630_MAX_COUNT for _, count, _ in SDM630_BATCHES)
+
+
+def float_format(start, count, addresses):
+    # struct format decoding the floats of the given addresses within a range of registers;
+    # unused registers are skipped by pad bytes and not decoded at all
+    fmt, pos = '>', start
+    for addr in sorted(a for a in addresses if start <= a < start + count):
+        if addr > pos:
+            fmt += '%dx' % (2 * (addr - pos))
+        fmt += 'f'
+        pos = addr + 2
+    return fmt
+
+# ------------------------------------------------------------------------------------
+#  Register image: the words of all batches are stored at their address in a flat
+#  buffer (2 bytes per register), which is decoded at once by a precompiled struct
+#  yielding the values in the order of _NAMES (faster than generated code assigning
+#  each register); the words of skipped batches are kept in the image
+#
+_IMAGE_SIZE = max(start + count for start, count, _ in SDM630_BATCHES)  # registers
+_IMAGE_STRUCT = struct.Struct(float_format(0, _IMAGE_SIZE, _ADDRESSES))
+# precompiled structs storing the register values read by minimalmodbus into the image
+_WORD_STRUCTS = tuple(struct.Struct('>%dH' % count) for _, count, _ in SDM630_BATCHES)
+
+_LINE_FORMAT = "{:40}: {:10.2f}{}".format
+
+
+def due_batches(cycle):
+    # indices of the batches to be read in the given cycle
+    return [i for i, (_, _, divisor) in enumerate(SDM630_BATCHES) if cycle % divisor == 0]
+
+
+def _crc_table():
+    # CRC-16/MODBUS (polynomial 0xA001) of all 256 byte values
+    table = array.array('H')
+    for crc in range(256):
+        for _ in range(8):
+            crc = (crc >> 1) ^ 0xA001 if crc & 1 else crc >> 1
+        table.append(crc)
+    return table
+
+_CRC_TABLE = _crc_table()
+
+
+def crc16(data, table=_CRC_TABLE):
+    # CRC-16/MODBUS of the given bytes (0 for a frame including its valid CRC)
+    crc = 0xFFFF
+    for b in data:
+        crc = (crc >> 8) ^ table[(crc ^ b) & 0xFF]
+    return crc
+
+
+@functools.lru_cache()
+def rtu_frames(slave):
+    # modbus RTU request frames (FC04) of all batches for a slave, built only once
+    frames = []
+    for start, count, _ in SDM630_BATCHES:
+        pdu = struct.pack('>BBHH', slave, 4, start, count)
+        frames.append(pdu + struct.pack('<H', crc16(pdu)))
+    return tuple(frames)
+
+
+def read_batches(instr, indices, blocks):
+    # reader thread: put the response of each batch (or the raised exception) to the queue;
+    # the cached request frames are sent directly, only if a response is not valid the
+    # batch is read again by minimalmodbus (which also handles the modbus exceptions)
+    try:
+        slave = instr.address
+        frames = rtu_frames(slave)
+        ser = instr.serial
+        char_bits = 1 + ser.bytesize + (ser.parity != serial.PARITY_NONE) + ser.stopbits
+        silent = max(3.5 * char_bits / ser.baudrate, 0.00175)  # silent interval between frames
+        for i in indices:
+            addr, count, _ = SDM630_BATCHES[i]
+            time.sleep(silent)
+            instr.serial.write(frames[i])
+            resp = instr.serial.read(5 + 2 * count)
+            if (len(resp) == 5 + 2 * count and resp[0] == slave and resp[1] == 4
+                    and resp[2] == 2 * count and crc16(resp) == 0):
+                blocks.put(resp)  # raw response, the registers start at offset 3
+            else:
+                instr.serial.reset_input_buffer()
+                blocks.put(instr.read_registers(addr, count, functioncode=4))
+    except Exception as ex:
+        blocks.put(ex)
+
+
+def setup(port='/dev/ttyAMA0', baudrate=38400, parity=serial.PARITY_NONE, stopbits=2):
+    # open the serial port once and preallocate the register image and the values
+    # (aligned with _NAMES)
+    instr = minimalmodbus.Instrument(port, 1, minimalmodbus.MODE_RTU) # port name, slave address (in decimal)
+    instr.serial.baudrate = baudrate
+    instr.serial.parity = parity
     instr.serial.bytesize = 8
-    instr.serial.stopbits = 2
+    instr.serial.stopbits = stopbits
     instr.serial.timeout = 1 # seconds
     #instr.debug = True
+    return instr, bytearray(2 * _IMAGE_SIZE), [0.0] * len(_NAMES)
 
-    # request modbus register values from device
-    start = timer()
-    reg_values = {}
-    for addr, size in SDM630_BLOCKS.items():
-        block = instr.read_registers(addr, size * 2, functioncode=4)
-        reg_values.update({ (addr + i): block[i] for i in range(0, len(block)) })
-    request_time = timer() - start
 
-    # convert modbus register values to float
+def poll(instr, image, values, cycle=0):
+    # request modbus register values of the batches due in this cycle from device (by a
+    # reader thread), store them into the register image while the next batch is being
+    # read and convert the whole image to float at the end
     start = timer()
-    mod_values = {}
-    for name, r in SDM630_REGISTER.items():
-        w0 = reg_values[r.address + 0]
-        w1 = reg_values[r.address + 1]
-        mod_values[name] = struct.unpack('>f', struct.pack('>HH', w0, w1))[0]
-    conversion_time = timer() - start
-
-    # print all values in order of their modbus address
-    for (name, _) in sorted(SDM630_REGISTER.items(), key = lambda x: x[1].address):
-        v = mod_values[name]
-        u = SDM630_REGISTER[name].unit
-        print("{:40}: {:10.2f} {}".format(name, v, "" if u is None else str(u)))
-
-    print("request took %.3f seconds" % request_time)
-    #print("conversion took %.3f seconds" % conversion_time)
+    indices = due_batches(cycle)
+    blocks = queue.Queue(maxsize=2)
+    reader = threading.Thread(target=read_batches, args=(instr, indices, blocks), daemon=True)
+    reader.start()
+    conversion_time = 0
+    for i in indices:
+        block = blocks.get()
+        if isinstance(block, Exception):
+            raise block
+        t = timer()
+        addr, count, _ = SDM630_BATCHES[i]
+        if isinstance(block, bytes):
+            image[2 * addr:2 * (addr + count)] = memoryview(block)[3:3 + 2 * count]
+        else:  # register values read by minimalmodbus
+            _WORD_STRUCTS[i].pack_into(image, 2 * addr, *block)
+        conversion_time += timer() - t
+    reader.join()
+    t = timer()
+    values[:] = _IMAGE_STRUCT.unpack_from(image)
+    conversion_time += timer() - t
+    return timer() - start, conversion_time
+
+
+def poll_meter(meter, cycle):
+    # poll a meter and return the failure of a read (e.g. no response after the fallback or a
+    # serial error) instead of raising it, so it does not stop the polling of the other meters
+    try:
+        return poll(*meter, cycle)
+    except (minimalmodbus.ModbusException, serial.SerialException) as ex:
+        return ex
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Read the input registers of a SDM630 energy meter.")
+    parser.add_argument("--interval", type=float, default=0,
+                        help="poll the meter every INTERVAL seconds (default: read once)")
+    parser.add_argument("--port", action="append",
+                        help="serial port of a meter, may be given several times to poll the "
+                             "meters on different buses in parallel (default: /dev/ttyAMA0)")
+    # serial settings, which must match the configuration of the meters: a higher baudrate
+    # (up to 115200 on most SDM630 variants) shortens the request time the most
+    parser.add_argument("--baudrate", type=int, default=38400,
+                        help="baudrate of the serial ports (default: 38400)")
+    parser.add_argument("--parity", choices=[serial.PARITY_NONE, serial.PARITY_EVEN, serial.PARITY_ODD],
+                        default=serial.PARITY_NONE, help="parity of the serial ports (default: N)")
+    parser.add_argument("--stopbits", type=int, choices=[1, 2], default=2,
+                        help="stop bits of the serial ports (default: 2)")
+    args = parser.parse_args()
+
+    ports = args.port or ['/dev/ttyAMA0']
+    meters = [setup(port, args.baudrate, args.parity, args.stopbits)
+              for port in ports]  # one instrument per port, never shared
+    cycle = 0
+    with ThreadPoolExecutor(max_workers=len(meters)) as executor:
+        while True:
+            results = list(executor.map(lambda meter: poll_meter(meter, cycle), meters))
+
+            # print all values in order of their modbus address (with a single write)
+            lines = []
+            poll_time = 0
+            for port, (_, _, values), result in zip(ports, meters, results):
+                if len(ports) > 1:
+                    lines.append("%s:" % port)
+                if isinstance(result, Exception):
+                    lines.append("reading the meter failed: %s" % result)
+                    continue
+                request_time, conversion_time = result
+                poll_time = max(poll_time, request_time)
+                lines += map(_LINE_FORMAT, _NAMES, values, _UNIT_SUFFIXES)
+                lines.append("request took %.3f seconds" % request_time)
+                #lines.append("conversion took %.3f seconds" % conversion_time)
+            sys.stdout.write("\n".join(lines) + "\n")
+            sys.stdout.flush()
+
+            if args.interval <= 0:
+                break
+            cycle += 1
+            time.sleep(max(0, args.interval - poll_time))
 
 
 if __name__ == '__main__':